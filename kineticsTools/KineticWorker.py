@@ -62,13 +62,16 @@ class KineticWorkerProcess(WorkerProcess):
     """
 
     def __init__(self,
-                 options,
-                 workQueue,
+                 sharedOptions,
+                 chunkTable,
                  resultsQueue,
+                 resultPool,
                  ipdModel,
-                 sharedAlignmentSet=None):
-        WorkerProcess.__init__(self, options, workQueue,
-                               resultsQueue, sharedAlignmentSet)
+                 sharedAlignmentSet=None,
+                 cpu=None):
+        WorkerProcess.__init__(self, sharedOptions, chunkTable,
+                               resultsQueue, resultPool, sharedAlignmentSet,
+                               cpu)
         self.ipdModel = ipdModel
         self.debug = False
 
@@ -311,7 +314,8 @@ class KineticWorkerProcess(WorkerProcess):
 
         # Decode the modifications
         decoder = ModificationDecode(self.ipdModel.gbmModel, canonicalSequence, mappedChunk, callBounds,
-                                     self.options.methylMinCov, self.options.modsToCall, self.options.methylFraction, self.options.useLDA)
+                                     self.options.methylMinCov, self.options.modsToCall, self.options.methylFraction, self.options.useLDA,
+                                     modsMask=self.options.modsMask)
 
         # Map the modification positions back to normal template indices
         for (r, mod) in decoder.decode().items():
@@ -334,7 +338,8 @@ class KineticWorkerProcess(WorkerProcess):
 
         mappedChunk = dict((toRefRev(pos), k) for (pos, k) in chunkRev.items())
         decoder = ModificationDecode(self.ipdModel.gbmModel, canonicalSequence, mappedChunk, callBounds,
-                                     self.options.methylMinCov, self.options.modsToCall, self.options.methylFraction, self.options.useLDA)
+                                     self.options.methylMinCov, self.options.modsToCall, self.options.methylFraction, self.options.useLDA,
+                                     modsMask=self.options.modsMask)
 
         for (r, mod) in decoder.decode().items():
             mod["strand"] = 1
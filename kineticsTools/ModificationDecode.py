@@ -8,14 +8,14 @@ from scipy.special import gammaln as gamln
 from numpy import log, pi, log10, e, log1p, exp
 import numpy as np
 
-from .MultiSiteCommon import MultiSiteCommon, canonicalBaseMap, modNames, ModificationPeakMask, FRAC, FRAClow, FRACup, log10e
+from .MultiSiteCommon import MultiSiteCommon, canonicalBaseMap, modNames, ModificationPeakMask, FRAC, FRAClow, FRACup, log10e, modMaskBits, modsToMask
 from .MixtureEstimationMethods import MixtureEstimationMethods
 
 
 class ModificationDecode(MultiSiteCommon):
 
     def __init__(self, gbmModel, sequence, rawKinetics, callBounds, methylMinCov, modsToCall=[
-                 'H', 'J', 'K'], methylFractionFlag=False, useLDAFlag=False):
+                 'H', 'J', 'K'], methylFractionFlag=False, useLDAFlag=False, modsMask=None):
 
         MultiSiteCommon.__init__(self, gbmModel, sequence, rawKinetics)
 
@@ -26,6 +26,10 @@ class ModificationDecode(MultiSiteCommon):
 
         self.methylMinCov = methylMinCov
         self.modsToCall = modsToCall
+        # Bit mask form of modsToCall, for the per-site tests
+        if modsMask is None:
+            modsMask = modsToMask(modsToCall)
+        self.modsMask = modsMask
         self.methylFractionFlag = methylFractionFlag
         self.useLDA = useLDAFlag
 
@@ -56,6 +60,10 @@ class ModificationDecode(MultiSiteCommon):
         scoreThresholdHigh = 19
         seq = self.sequence
 
+        callH = self.modsMask & modMaskBits['H']
+        callJ = self.modsMask & modMaskBits['J']
+        callK = self.modsMask & modMaskBits['K']
+
         for (pos, peak) in self.rawKinetics.items():
             score = peak['score']
 
@@ -76,14 +84,14 @@ class ModificationDecode(MultiSiteCommon):
                 c = seq[pos]
 
                 # On-target A peak
-                if 'H' in self.modsToCall and c == 'A' and score > scoreThresholdHigh:
+                if callH and c == 'A' and score > scoreThresholdHigh:
                     self.alternateBases[pos].add('H')
 
                 # On-target C peak
-                if 'J' in self.modsToCall and c == 'C' and score > scoreThresholdHigh:
+                if callJ and c == 'C' and score > scoreThresholdHigh:
                     self.alternateBases[pos].add('J')
 
-                if 'K' in self.modsToCall:
+                if callK:
                     if c == 'C':
                         self.alternateBases[pos].add('K')
 
@@ -16,12 +16,21 @@ modNames = {'H': 'm6A', 'I': 'm5C', 'J': 'm4C', 'K': 'm5C'}
 ModificationPeakMask = {
     'm6A': [0, -5], 'm4C': [0, -5], 'm5C': [2, 0, -1, -2, -4, -5, -6]}
 
+# Bit standing for each callable modification in an integer mask
+modMaskBits = {'H': 1, 'J': 2, 'K': 4}
+
 # Labels for modified fraction:
 
 FRAC = 'frac'
 FRAClow = 'fracLow'
 FRACup = 'fracUp'
 
+
+def modsToMask(modsToCall):
+    """Pack a list of modification codes ('H', 'J', 'K') into a bit mask"""
+    return sum(modMaskBits[m] for m in set(modsToCall))
+
+
 # Try computing these only once
 
 k1 = s.norm.ppf(0.025)
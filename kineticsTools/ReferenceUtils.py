@@ -7,12 +7,17 @@ import math
 import re
 import os
 
+import numpy as np
+
 from pbcore.io import ReferenceSet
 
 # FIXME pbcore keys contigs by name, but kineticsTools usually keys by ID
 ReferenceWindow = namedtuple(
     "ReferenceWindow", ["refId", "refName", "start", "end"])
 
+# refName:start-end
+_referenceWindowRe = re.compile("(.*):(.*)-(.*)")
+
 
 def loadReferenceContigs(referencePath, alignmentSet, windows=None):
     # FIXME we should get rid of this entirely, but I think it requires
@@ -60,7 +65,7 @@ def referenceWindowsFromAlignment(ds, refInfoLookup):
 def parseReferenceWindow(s, refInfoLookup):
     if s is None:
         return None
-    m = re.match("(.*):(.*)-(.*)", s)
+    m = _referenceWindowRe.match(s)
     if m:
         refContigInfo = refInfoLookup(m.group(1))
         refId = refContigInfo.ID
@@ -124,6 +129,21 @@ def enumerateChunks(referenceStride, referenceWindow):
                               start=s, end=e)
 
 
+def enumerateChunkBounds(referenceStride, referenceWindow):
+    """
+    Vectorized equivalent of enumerateChunks: return the start and end
+    coordinates of every work chunk on this reference window as a pair
+    of int64 arrays.
+    """
+    start, end = referenceWindow.start, referenceWindow.end
+    # Chunk boundaries are aligned on multiples of the stride
+    roundStart = (start // referenceStride) * referenceStride
+    strideStarts = np.arange(roundStart, end, referenceStride, dtype=np.int64)
+    starts = np.maximum(strideStarts, start)
+    ends = np.minimum(strideStarts + referenceStride, end)
+    return starts, ends
+
+
 def loadAlignmentChemistry(alignmentSet):
     chems = alignmentSet.sequencingChemistry
     chemCounts = {k: len(list(v)) for k, v in itertools.groupby(chems)}
@@ -30,11 +30,14 @@ class ResultCollectorProcess(Process):
     Gathers results and writes to a file.
     """
 
-    def __init__(self, options, resultsQueue):
+    def __init__(self, sharedOptions, resultsQueue, resultPool):
         Process.__init__(self)
         self.daemon = True
-        self.options = options
+        # Unpacked from shared memory once the process is running
+        self._sharedOptions = sharedOptions
+        self.options = None
         self._resultsQueue = resultsQueue
+        self._resultPool = resultPool
 
     def _run(self):
         log.info("Process %s (PID=%d) started running" % (self.name, self.pid))
@@ -47,21 +50,20 @@ class ResultCollectorProcess(Process):
         sentinelsReceived = 0
         while sentinelsReceived < self.options.numWorkers:
             result = self._resultsQueue.get()
-            self._resultsQueue.task_done()
 
             if result is None:
                 sentinelsReceived += 1
             else:
                 # Write out chunks in chunkId order.
                 # Buffer received chunks until they can be written in order
-                (chunkId, datum) = result
-                chunkCache[chunkId] = datum
-
-                # The rawData field is large and unused. Delete it to mitigate
-                # risk of OOM problems
-                for column in datum:
-                    if 'rawData' in column:
-                        del column['rawData']
+                (chunkId, index, payload) = result
+                if index is None:
+                    # Too big for a pooled buffer; shipped inline
+                    chunkCache[chunkId] = pickle.loads(payload)
+                else:
+                    with self._resultPool.getBuffer(index) as buf:
+                        chunkCache[chunkId] = pickle.loads(buf[:payload])
+                    self._resultPool.release(index)
 
                 # Write out all the chunks that we can
                 while nextChunkId in chunkCache:
@@ -74,6 +76,7 @@ class ResultCollectorProcess(Process):
         self.onFinish()
 
     def run(self):
+        self.options = self._sharedOptions.load()
 
         if self.options.doProfiling:
             cProfile.runctx("self._run()",
@@ -98,8 +101,10 @@ class ResultCollectorProcess(Process):
 
 class KineticsWriter(ResultCollectorProcess):
 
-    def __init__(self, options, resultQueue, refInfo, ipdModel):
-        ResultCollectorProcess.__init__(self, options, resultQueue)
+    def __init__(self, sharedOptions, resultQueue, resultPool, refInfo,
+                 ipdModel):
+        ResultCollectorProcess.__init__(
+            self, sharedOptions, resultQueue, resultPool)
 
         self.refInfo = refInfo
         self.ipdModel = ipdModel
@@ -2,6 +2,7 @@ import cProfile
 import logging
 import os.path
 import copy
+import pickle
 from multiprocessing import Process
 from multiprocessing.process import current_process
 import warnings
@@ -12,6 +13,8 @@ import numpy as np
 from pbcore.io import AlignmentSet
 from pbcore.io.opener import (openAlignmentFile, openIndexedAlignmentFile)
 
+from kineticsTools.ReferenceUtils import ReferenceWindow
+
 
 # FIXME this should ultimately go somewhere else.  actually, so should the
 # rest of this module.
@@ -64,11 +67,31 @@ def _reopen(self):
     return newSet
 
 
+def _adviseSequential(fileNames):
+    """
+    Tell the kernel that this process reads the given files front to
+    back, which makes it double the readahead window.  The hint belongs
+    to an open file description rather than to the file, so it is given
+    on the descriptors the readers already hold, found via /proc/self/fd.
+    """
+    fdDir = "/proc/self/fd"
+    if not hasattr(os, "posix_fadvise") or not os.path.isdir(fdDir):
+        return
+    paths = set(os.path.realpath(f) for f in fileNames)
+    for fd in os.listdir(fdDir):
+        try:
+            if os.readlink(os.path.join(fdDir, fd)) in paths:
+                os.posix_fadvise(int(fd), 0, 0, os.POSIX_FADV_SEQUENTIAL)
+        except OSError:
+            # The descriptor went away, or is not a regular file
+            pass
+
+
 class WorkerProcess(Process):
 
     """
-    Base class for worker processes that read reference coordinates
-    from the task queue, perform variant calling, then push results
+    Base class for worker processes that claim reference coordinates
+    from the shared chunk table, perform variant calling, then push results
     back to another queue, to be written to a GFF file by another
     process.
 
@@ -77,14 +100,19 @@ class WorkerProcess(Process):
     process only O(genome length) work to do.
     """
 
-    def __init__(self, options, workQueue, resultsQueue,
-                 sharedAlignmentSet=None):
+    def __init__(self, sharedOptions, chunkTable, resultsQueue, resultPool,
+                 sharedAlignmentSet=None, cpu=None):
         Process.__init__(self)
-        self.options = options
+        # Unpacked from shared memory once the process is running
+        self._sharedOptions = sharedOptions
+        self.options = None
         self.daemon = True
-        self._workQueue = workQueue
+        self._chunkTable = chunkTable
         self._resultsQueue = resultsQueue
+        self._resultPool = resultPool
         self._sharedAlignmentSet = sharedAlignmentSet
+        # CPU to pin this process to (--pinWorkers), or None
+        self._cpu = cpu
 
     def _run(self):
         logging.info("Worker %s (PID=%d) started running" %
@@ -105,6 +133,17 @@ class WorkerProcess(Process):
             self.controlAlignments = AlignmentSet(self.options.control,
                                                   referenceFastaFname=self.options.reference)
 
+        # Chunks are claimed in reference order, so the BAMs are read
+        # mostly sequentially
+        alignmentSets = [self.caseAlignments, self.controlAlignments]
+        _adviseSequential(urlparse(extRes.resourceId).path
+                          for ds in alignmentSets if ds is not None
+                          for extRes in ds.externalResources)
+
+        # Chunks arrive as bare (chunkId, refId, start, end) records
+        refNames = dict((r.ID, r.Name)
+                        for r in self.caseAlignments.referenceInfoTable)
+
         if self.options.randomSeed is None:
             np.random.seed(42)
         self.onStart()
@@ -113,15 +152,16 @@ class WorkerProcess(Process):
             if self.isTerminated():
                 break
 
-            chunkDesc = self._workQueue.get()
+            chunkDesc = self._chunkTable.claimChunk()
             if chunkDesc is None:
-                # Sentinel indicating end of input.  Place a sentinel
+                # All chunks have been claimed.  Place a sentinel
                 # on the results queue and end this worker process.
                 self._resultsQueue.put(None)
-                self._workQueue.task_done()
                 break
             else:
-                (chunkId, datum) = chunkDesc
+                (chunkId, refId, start, end) = chunkDesc
+                datum = ReferenceWindow(refId=refId, refName=refNames[refId],
+                                        start=start, end=end)
                 logging.info("Got chunk: (%s, %s) -- Process: %s" %
                              (chunkId, str(datum), current_process()))
                 result = self.onChunk(  # pylint: disable=assignment-from-none
@@ -129,15 +169,40 @@ class WorkerProcess(Process):
 
                 logging.debug("Process %s: putting result." %
                               current_process())
-                self._resultsQueue.put((chunkId, result))
-                self._workQueue.task_done()
+                self._putResult(chunkId, result)
 
         self.onFinish()
 
         logging.info("Process %s (PID=%d) done; exiting." %
                      (self.name, self.pid))
 
+    def _putResult(self, chunkId, result):
+        """
+        Serialize a result into a buffer rented from the shared result
+        pool and queue only its index.  Results too big for a pooled
+        buffer travel on the queue as plain bytes instead.
+        """
+        # The rawData field is large and unused by the writer. Delete it
+        # before serializing the result
+        for column in result:
+            if 'rawData' in column:
+                del column['rawData']
+
+        payload = pickle.dumps(result, protocol=pickle.HIGHEST_PROTOCOL)
+        if len(payload) > self._resultPool.bufferSize:
+            self._resultsQueue.put((chunkId, None, payload))
+        else:
+            index = self._resultPool.rent()
+            with self._resultPool.getBuffer(index) as buf:
+                buf[:len(payload)] = payload
+            self._resultsQueue.put((chunkId, index, len(payload)))
+
     def run(self):
+        if self._cpu is not None:
+            os.sched_setaffinity(0, {self._cpu})
+
+        self.options = self._sharedOptions.load()
+
         # Make the workers run with lower priority -- hopefully the results writer will win
         # It is single threaded so it could become the bottleneck
         self._lowPriority()
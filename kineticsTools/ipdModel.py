@@ -8,7 +8,7 @@ import re
 import numpy as np
 import ctypes as C
 
-from kineticsTools.sharedArray import SharedArray
+from kineticsTools.sharedArray import SharedArray, SharedNumpyArray
 
 # XXX can this vary?
 LINUX_SO_FILE = "tree_predict.cpython-37m-x86_64-linux-gnu.so"
@@ -61,6 +61,12 @@ class GbmContextModel(object):
     Contexts may contain arbitrary combinations of modified bases
     """
 
+    # The tree tables -- these are moved to shared memory once built
+    _sharedArrayNames = [
+        'splitVar', 'leftNodes', 'rightNodes', 'missingNodes', 'splitVar16',
+        'splitCodes', 'cSplits', 'bSplits', 'leftNodesOffset',
+        'rightNodesOffset', 'missingNodesOffset', 'splitCodesCtx']
+
     def __init__(self, modelH5Group, modelIterations=-1):
 
         # This will hold the ctypes function pointer
@@ -135,6 +141,26 @@ class GbmContextModel(object):
         if modelIterations > 0:
             self.nTrees = modelIterations
 
+        self._sharedArrays = dict(
+            (name, SharedNumpyArray(getattr(self, name)))
+            for name in self._sharedArrayNames)
+        self._wrapSharedArrays()
+
+    def _wrapSharedArrays(self):
+        for (name, sa) in self._sharedArrays.items():
+            setattr(self, name, sa.getNumpyWrapper())
+
+    def __getstate__(self):
+        # Send the shared arrays, not copies of their contents
+        state = self.__dict__.copy()
+        for name in self._sharedArrayNames:
+            del state[name]
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._wrapSharedArrays()
+
     def _initNativeTreePredict(self):
         """
         Initialization routine the C tree-predict method
@@ -7,16 +7,18 @@ Tool for detecting DNA base-modifications from kinetic signatures.
 import cProfile
 import functools
 import gc
+import glob
 import itertools
 import argparse
 import json
 
 import os
 import logging
+import mmap
+import stat
 import sys
 import multiprocessing
-import time
-import threading
+import multiprocessing.connection
 import numpy as np
 import queue
 import traceback
@@ -30,24 +32,87 @@ from pbcore.io import AlignmentSet
 from kineticsTools.KineticWorker import KineticWorkerProcess
 from kineticsTools.ResultWriter import KineticsWriter
 from kineticsTools.ipdModel import IpdModel
+from kineticsTools.MultiSiteCommon import modMaskBits
+from kineticsTools.sharedArray import SharedBufferPool, SharedChunkTable, SharedNamespace
 from kineticsTools import ReferenceUtils, loader
 
 __version__ = "3.0"
 
 log = logging.getLogger(__name__)
 
+# Logical CPUs on this machine; os.cpu_count() returns None if unknown
+_CPU_COUNT = os.cpu_count() or 1
+
 
 class Constants(object):
     PVALUE_DEFAULT = 0.01
     MAX_LENGTH_DEFAULT = int(3e12)
+    # Size of the shared buffers that results are returned in, per base
+    # of --referenceStride.  Larger results bypass the buffers.
+    RESULT_BUFFER_BYTES_PER_BASE = 1024
 
 
-def _getResourcePathSpec():
+@functools.lru_cache(maxsize=1)
+def _getResourceDir():
+    """Locate the bundled kinetics models; this only needs to happen once"""
     try:
-        with resources.as_file(resources.files('kineticTools') / 'resources') as path:
-            return loader.getResourcePathSpec(path)
-    except:
-        return loader.getResourcePathSpec(os.path.join(os.path.dirname(__file__), 'resources'))
+        path = resources.files('kineticsTools') / 'resources'
+    except ModuleNotFoundError:
+        path = None
+    # Only a real directory will do: the path outlives this call
+    if isinstance(path, os.PathLike) and path.is_dir():
+        return os.fspath(path)
+    return os.path.join(os.path.dirname(__file__), 'resources')
+
+
+def _getResourcePathSpec():
+    return loader.getResourcePathSpec(_getResourceDir())
+
+
+def _parseCpuList(cpuList):
+    """
+    Expand a kernel CPU list such as "0-3,8,10-11" into a list of CPUs
+    """
+    cpus = []
+    for span in cpuList.strip().split(","):
+        if span:
+            lo, _, hi = span.partition("-")
+            cpus.extend(range(int(lo), int(hi or lo) + 1))
+    return cpus
+
+
+def _numaOrderedCpus():
+    """
+    Return the CPUs this process may run on, grouped by NUMA node so that
+    consecutively numbered workers share a node.
+    """
+    available = os.sched_getaffinity(0)
+    cpus = []
+    nodeDirs = glob.glob("/sys/devices/system/node/node[0-9]*")
+    for nodeDir in sorted(nodeDirs, key=lambda d: int(d.rsplit("node", 1)[1])):
+        with open(os.path.join(nodeDir, "cpulist")) as f:
+            cpus.extend(c for c in _parseCpuList(f.read()) if c in available)
+    # Anything the kernel didn't place on a node (or no NUMA info at all)
+    cpus.extend(sorted(available - set(cpus)))
+    return cpus
+
+
+def _slurpWindowFile(fname):
+    """
+    Join the non-blank lines of a reference window file with commas
+    """
+    def joinLines(lines):
+        stripped = (l.strip() for l in lines)
+        return b",".join(l for l in stripped if l).decode()
+
+    with open(fname, "rb") as f:
+        st = os.fstat(f.fileno())
+        # Only a regular, non-empty file can be mapped; anything else
+        # (e.g. a pipe from -W <(...)) is read line by line
+        if stat.S_ISREG(st.st_mode) and st.st_size > 0:
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                return joinLines(iter(mm.readline, b""))
+        return joinLines(f)
 
 
 def _validateResource(func, p):
@@ -112,6 +177,11 @@ def get_parser():
                    default=1,
                    type=int,
                    help='Number of thread to use (-1 uses all logical cpus)')
+    p.add_argument('--pinWorkers',
+                   action="store_true",
+                   dest='pinWorkers',
+                   default=False,
+                   help='Pin each worker process to one CPU, filling NUMA nodes in turn (Linux only)')
     # common options
     p.add_argument("--pvalue",
                    type=float,
@@ -258,15 +328,12 @@ def get_parser():
                    "be processed, in the format refGroup[:refStart-refEnd] " + \
                    "(default: entire reference).")
 
-    def slurpWindowFile(fname):
-        return ",".join(map(str.strip, open(fname).readlines()))
-
     p.add_argument("--refContigIndex", type=int, dest='refContigIndex', default=-1,
                    help="For debugging purposes only - rather than enter a reference contig name, simply enter an index")
 
     p.add_argument("-W", "--referenceWindowsFile",
                    "--refContigsFile",  # backwards compatibility
-                   type=slurpWindowFile,
+                   type=_slurpWindowFile,
                    dest='referenceWindowsAsString',
                    default=None,
                    help="A file containing reference window designations, one per line")
@@ -309,6 +376,10 @@ class KineticsToolsRunner(object):
     def __init__(self, args):
         self.args = args
         self.alignments = None
+        self._resultCollectorProcess = None
+        self._chunkTable = None
+        self._resultPool = None
+        self._sharedOptions = None
 
     def start(self):
         self.validateArgs()
@@ -318,9 +389,12 @@ class KineticsToolsRunner(object):
         return __version__
 
     def validateArgs(self):
-        parser = get_parser()
+        def error(message):
+            # Only build the parser when there is an error to report
+            get_parser().error(message)
+
         if not os.path.exists(self.args.alignment_set):
-            parser.error('Input AlignmentSet file provided does not exist')
+            error('Input AlignmentSet file provided does not exist')
 
         # Over-ride --identify if --control was specified
         if self.args.control:
@@ -328,12 +402,12 @@ class KineticsToolsRunner(object):
 
         if self.args.useLDA:
             if self.args.m5Cclassifier is None:
-                parser.error(
+                error(
                     'Please specify a folder containing forward.csv and reverse.csv classifiers in --m5Cclassifier.')
 
         if self.args.m5Cgff:
             if not self.args.useLDA:
-                parser.error(
+                error(
                     'm5Cgff file can only be generated in --useLDA mode.')
 
         # if self.args.methylFraction and not self.args.identify:
@@ -341,23 +415,29 @@ class KineticsToolsRunner(object):
 
     def run(self):
 
+        # Fork, rather than spawn, the workers so that the AlignmentSet
+        # indices and the IpdModel loaded by this process are shared
+        # copy-on-write instead of being pickled into every child.
+        # Python 3.14 no longer defaults to fork on Linux.
+        if sys.platform.startswith('linux'):
+            multiprocessing.set_start_method('fork', force=True)
+
         # Figure out what modifications to identify
+        # The workers test the bit mask; modsToCall is kept for the code
+        # that still takes a list of modification codes
         mods = self.args.identify
-        modsToCall = []
+        modsMask = 0
         if mods:
-            items = mods.split(",")
-
-            if 'm6A' in items:
-                modsToCall.append('H')
-
-            if 'm4C' in items:
-                modsToCall.append('J')
-
-            if 'm5C_TET' in items:
-                modsToCall.append('K')
+            items = set(mods.split(","))
+            modsMask = (('m6A' in items) * modMaskBits['H'] |
+                        ('m4C' in items) * modMaskBits['J'] |
+                        ('m5C_TET' in items) * modMaskBits['K'])
 
             self.args.identify = True
-            self.args.modsToCall = modsToCall
+            self.args.modsToCall = [m for m in "HJK"
+                                    if modsMask & modMaskBits[m]]
+
+        self.args.modsMask = modsMask
 
         self.options = self.args
         self.options.cmdLine = " ".join(sys.argv)
@@ -369,46 +449,52 @@ class KineticsToolsRunner(object):
         if self.options.randomSeed is not None:
             np.random.seed(self.options.randomSeed)
 
-        if self.args.doProfiling:
-            cProfile.runctx("self._mainLoop()",
-                            globals=globals(),
-                            locals=locals(),
-                            filename="profile.out")
-
-        else:
-            try:
+        try:
+            if self.args.doProfiling:
+                profiler = cProfile.Profile()
+                try:
+                    ret = profiler.runcall(self._mainLoop)
+                finally:
+                    profiler.dump_stats("profile.out")
+            else:
                 ret = self._mainLoop()
-            finally:
-                # Be sure to shutdown child processes if we get an exception on
-                # the main thread
-                for w in self._workers:
-                    if w.is_alive():
-                        w.terminate()
-
-            return ret
+        finally:
+            # Be sure to shutdown child processes if we get an exception on
+            # the main thread
+            if self._chunkTable is not None:
+                self._chunkTable.markDone()
+            children = list(self._workers)
+            if self._resultCollectorProcess is not None:
+                children.append(self._resultCollectorProcess)
+            for w in children:
+                if w.is_alive():
+                    w.terminate()
+            self._releaseSharedMemory()
+
+        return ret
 
     def _initQueues(self):
-        # Work chunks are created by the main thread and put on this queue
-        # They will be consumed by KineticWorker threads, stored in
-        # self._workers
-        self._workQueue = multiprocessing.JoinableQueue(
-            self.options.maxQueueSize)
-
         # Completed chunks are put on this queue by KineticWorker threads
         # They are consumed by the KineticsWriter process
-        self._resultsQueue = multiprocessing.JoinableQueue(
-            self.options.maxQueueSize)
+        self._resultsQueue = multiprocessing.Queue(self.options.maxQueueSize)
+
+        # The results themselves are serialized into these shared
+        # buffers; the queue only carries buffer indices.  One buffer
+        # per queue slot, one being filled by each worker and one being
+        # read by the writer means workers never wait on the pool.
+        self._resultPool = SharedBufferPool(
+            self.options.maxQueueSize + self.options.numWorkers + 1,
+            Constants.RESULT_BUFFER_BYTES_PER_BASE * self.options.referenceStride)
 
     def _launchSlaveProcesses(self):
         """
-        Launch a group of worker processes (self._workers), the queue
-        (self._workQueue) that will be used to send them chunks of
-        work, and the queue that will be used to receive back the
-        results (self._resultsQueue).
+        Launch a group of worker processes (self._workers), which claim
+        their chunks of work from self._chunkTable, and the queue that
+        will be used to receive back the results (self._resultsQueue).
 
         Additionally, launch the result collector process.
         """
-        availableCpus = multiprocessing.cpu_count()
+        availableCpus = _CPU_COUNT
         logging.info("Available CPUs: %d" % (availableCpus,))
         logging.info("Requested worker processes: %d" %
                      (self.options.numWorkers,))
@@ -425,30 +511,43 @@ class KineticsToolsRunner(object):
 
         self._initQueues()
 
+        # Children unpack the options from shared memory at startup
+        self._sharedOptions = SharedNamespace(self.options)
+
+        workerCpus = None
+        if self.options.pinWorkers:
+            if hasattr(os, 'sched_setaffinity'):
+                workerCpus = _numaOrderedCpus()
+            else:
+                logging.warn("--pinWorkers is not supported on this platform")
+
+        # Move everything loaded so far out of reach of the cyclic GC, so
+        # collections in the forked children don't write to (and thereby
+        # copy) the pages they share with this process.
+        gc.freeze()
+
         # Launch the worker processes
         self._workers = []
         for i in range(self.options.numWorkers):
             p = KineticWorkerProcess(
-                self.options,
-                self._workQueue,
+                self._sharedOptions,
+                self._chunkTable,
                 self._resultsQueue,
+                self._resultPool,
                 self.ipdModel,
-                sharedAlignmentSet=self.alignments)
+                sharedAlignmentSet=self.alignments,
+                cpu=workerCpus[i % len(workerCpus)] if workerCpus else None)
             self._workers.append(p)
             p.start()
         logging.info("Launched worker processes.")
 
         # Launch result collector
         self._resultCollectorProcess = KineticsWriter(
-            self.options, self._resultsQueue, self.refInfo, self.ipdModel)
+            self._sharedOptions, self._resultsQueue, self._resultPool,
+            self.refInfo, self.ipdModel)
         self._resultCollectorProcess.start()
         logging.info("Launched result collector process.")
 
-        # Spawn a thread that monitors worker threads for crashes
-        self.monitoringThread = threading.Thread(target=monitorChildProcesses, args=(
-            self._workers + [self._resultCollectorProcess],))
-        self.monitoringThread.start()
-
     def _queueChunksForWindow(self, refWindow):
         """
         Compute the chunk extents and queue up the work for a single reference
@@ -488,53 +587,76 @@ class KineticsToolsRunner(object):
         First launch the worker and writer processes
         Then we loop over ReferenceGroups in the alignments.  For each contig we will:
         1. Load the sequence into the main memory of the parent process
-        3. Chunk up the contig and submit the chunk descriptions to the work queue
+        3. Chunk up the contig into a table that the workers claim chunks from
         Finally, wait for the writer process to finish.
         """
 
-        # This looks scary but it's not.  Python uses reference
-        # counting and has a secondary, optional garbage collector for
-        # collecting garbage cycles.  Unfortunately when a cyclic GC
-        # happens when a thread is calling cPickle.dumps, the
-        # interpreter crashes sometimes.  See Bug 19704.  Since we
-        # don't leak garbage cycles, disabling the cyclic GC is
-        # essentially harmless.
-        # gc.disable()
-
-        self.loadSharedAlignmentSet(self.args.alignment_set)
-
-        # Resolve the windows that will be visited.
-        if self.args.referenceWindowsAsString is not None:
-            self.referenceWindows = []
-            for s in self.args.referenceWindowsAsString.split(","):
-                try:
-                    win = ReferenceUtils.parseReferenceWindow(
-                        s, self.alignments.referenceInfo)
-                    self.referenceWindows.append(win)
-                except BaseException:
-                    if self.args.skipUnrecognizedContigs:
-                        continue
-                    else:
-                        raise Exception("Unrecognized contig!")
-        elif self.args.referenceWindowsFromAlignment:
-            self.referenceWindows = ReferenceUtils.referenceWindowsFromAlignment(
-                self.alignments, self.alignments.referenceInfo)
-            refNames = set([rw.refName for rw in self.referenceWindows])
-            # limit output to contigs that overlap with reference windows
-            self.refInfo = [r for r in self.refInfo if r.Name in refNames]
-        else:
-            self.referenceWindows = ReferenceUtils.createReferenceWindows(
-                self.refInfo)
-
-        # Load reference and IpdModel
-        chemName = ReferenceUtils.loadAlignmentChemistry(self.alignments)
-        if self.args.useChemistry is not None:
-            chemName = self.args.useChemistry
-        ipdModelFilename = loader.getIpdModelFilename(
-            ipdModel=self.args.ipdModel,
-            majorityChem=chemName,
-            paramsPath=self.args.paramsPath)
-        self.loadReferenceAndModel(self.args.reference, ipdModelFilename)
+        # Setting up allocates lots of small, long-lived objects (windows,
+        # reference info, model tables) and no garbage cycles, so the
+        # cyclic GC only burns time re-scanning them.  It is switched
+        # back on before the children are forked.
+        gc.disable()
+        try:
+            self.loadSharedAlignmentSet(self.args.alignment_set)
+
+            # Resolve the windows that will be visited.
+            if self.args.referenceWindowsAsString is not None:
+                self.referenceWindows = []
+                # Window lists from -W often name the same contig many times
+                refInfoLookup = functools.lru_cache(maxsize=None)(
+                    self.alignments.referenceInfo)
+                for s in self.args.referenceWindowsAsString.split(","):
+                    try:
+                        win = ReferenceUtils.parseReferenceWindow(
+                            s, refInfoLookup)
+                        self.referenceWindows.append(win)
+                    except BaseException:
+                        if self.args.skipUnrecognizedContigs:
+                            continue
+                        else:
+                            raise Exception("Unrecognized contig!")
+            elif self.args.referenceWindowsFromAlignment:
+                self.referenceWindows = ReferenceUtils.referenceWindowsFromAlignment(
+                    self.alignments, self.alignments.referenceInfo)
+                refNames = frozenset(rw.refName
+                                     for rw in self.referenceWindows)
+                # limit output to contigs that overlap with reference windows
+                self.refInfo = [r for r in self.refInfo if r.Name in refNames]
+            else:
+                self.referenceWindows = ReferenceUtils.createReferenceWindows(
+                    self.refInfo)
+
+            # Load reference and IpdModel
+            chemName = ReferenceUtils.loadAlignmentChemistry(self.alignments)
+            if self.args.useChemistry is not None:
+                chemName = self.args.useChemistry
+            ipdModelFilename = loader.getIpdModelFilename(
+                ipdModel=self.args.ipdModel,
+                majorityChem=chemName,
+                paramsPath=self.args.paramsPath)
+            self.loadReferenceAndModel(self.args.reference, ipdModelFilename)
+
+            # Chunk up every window once, into a table shared with the
+            # workers; they claim chunks from it themselves
+            chunkArrays = []
+            for window in self.referenceWindows:
+                logging.info('Processing window/contig: %s' % (window,))
+                (starts, ends) = ReferenceUtils.enumerateChunkBounds(
+                    self.args.referenceStride, window)
+                windowChunks = np.empty(len(starts),
+                                        dtype=SharedChunkTable.dtype)
+                windowChunks['ref'] = window.refId
+                windowChunks['start'] = starts
+                windowChunks['end'] = ends
+                chunkArrays.append(windowChunks)
+            if chunkArrays:
+                chunks = np.concatenate(chunkArrays)
+            else:
+                chunks = np.empty(0, dtype=SharedChunkTable.dtype)
+            self._chunkTable = SharedChunkTable(chunks)
+            del chunkArrays, chunks
+        finally:
+            gc.enable()
 
         # Spawn workers
         self._launchSlaveProcesses()
@@ -545,64 +667,70 @@ class KineticsToolsRunner(object):
         #self.referenceMap = self.alignments['/RefGroup'].asDict('RefInfoID', 'ID')
         #self.alnInfo = self.alignments['/AlnInfo'].asRecArray()
 
-        # Main loop -- we loop over ReferenceGroups in the alignments.  For each contig we will:
-        # 1. Load the sequence into the main memory of the parent process
-        # 2. Fork the workers
-        # 3. chunk up the contig and
-
-        self.workChunkCounter = 0
-
-        # Iterate over references
-        for window in self.referenceWindows:
-            logging.info('Processing window/contig: %s' % (window,))
-            for chunk in ReferenceUtils.enumerateChunks(
-                    self.args.referenceStride, window):
-                self._workQueue.put((self.workChunkCounter, chunk))
-                self.workChunkCounter += 1
-
-        # Shutdown worker threads with None sentinels
-        for i in range(self.args.numWorkers):
-            self._workQueue.put(None)
+        # Workers exit on their own once the chunk table is exhausted, so
+        # all that is left for the main thread is to watch the children
+        # for crashes until they are done.  If one fails, run() shuts
+        # the rest down and releases the shared memory.
+        ret = monitorChildProcesses(
+            self._workers + [self._resultCollectorProcess])
+        if ret:
+            return ret
 
         for w in self._workers:
             w.join()
 
-        # Join on the result queue and the resultsCollector process.
-        # This ensures all the results are written before shutdown.
-        self.monitoringThread.join()
-        self._resultsQueue.join()
+        # The resultsCollector only exits after it has received every
+        # worker's sentinel, so joining it ensures all the results are
+        # written before shutdown.
         self._resultCollectorProcess.join()
+        self._releaseSharedMemory()
         logging.info("ipdSummary.py finished. Exiting.")
         self.alignments.close()
         return 0
 
+    def _releaseSharedMemory(self):
+        """
+        Free the shared-memory segments backing the chunk table, the
+        result buffers and the options.  Safe to call more than once.
+        """
+        if self._chunkTable is not None:
+            self._chunkTable.close()
+            self._chunkTable.unlink()
+            self._chunkTable = None
+        if self._resultPool is not None:
+            self._resultPool.close()
+            self._resultPool.unlink()
+            self._resultPool = None
+        if self._sharedOptions is not None:
+            self._sharedOptions.close()
+            self._sharedOptions.unlink()
+            self._sharedOptions = None
+
 
 def monitorChildProcesses(children):
     """
-    Monitors child processes: promptly exits if a child is found to
-    have exited with a nonzero exit code received; otherwise returns
-    zero when all processes exit cleanly (0).
+    Monitors child processes: promptly returns the exit code of the
+    first child found to have exited with a nonzero exit code, leaving
+    the caller to shut down the others; otherwise returns zero when all
+    processes exit cleanly (0).
 
     This approach is portable--catching SIGCHLD doesn't work on
-    Windows.
+    Windows.  Rather than polling, we block on the process sentinels,
+    which become ready as soon as the process exits.
     """
-    while True:
-        all_exited = all(not p.is_alive() for p in children)
-        nonzero_exits = [p.exitcode for p in children if p.exitcode]
-        if nonzero_exits:
-            exitcode = nonzero_exits[0]
-            logging.error(
-                "Child process exited with exitcode=%d.  Aborting." % exitcode)
-
-            # Kill all the child processes
-            for p in children:
-                if p.is_alive():
-                    p.terminate()
-
-            os._exit(exitcode)
-        elif all_exited:
-            return 0
-        time.sleep(1)
+    running = dict((p.sentinel, p) for p in children)
+    while running:
+        for sentinel in multiprocessing.connection.wait(list(running)):
+            # The sentinel can fire a moment before the process can be
+            # reaped, so join it to be sure the exit code is set
+            child = running.pop(sentinel)
+            child.join()
+            exitcode = child.exitcode
+            if exitcode:
+                logging.error(
+                    "Child process exited with exitcode=%d.  Aborting." % exitcode)
+                return exitcode
+    return 0
 
 
 def args_runner(args):
@@ -1,4 +1,8 @@
-from multiprocessing.sharedctypes import RawArray
+import json
+import multiprocessing
+from multiprocessing.sharedctypes import RawArray, RawValue
+from multiprocessing.shared_memory import SharedMemory
+import types
 import warnings
 import numpy as np
 
@@ -19,3 +23,174 @@ class SharedArray:
         with warnings.catch_warnings():
             warnings.simplefilter("ignore")
             return np.ctypeslib.as_array(self._rawArray)
+
+
+class SharedNumpyArray:
+
+    """
+    Shared-memory copy of a numpy array of any dtype and shape.  Like
+    SharedArray, child processes inherit the memory itself rather than
+    a pickled copy of the data.
+    """
+
+    def __init__(self, array):
+        self._dtype = array.dtype
+        self._shape = array.shape
+        self._rawArray = RawArray('B', max(1, array.nbytes))
+        self.getNumpyWrapper()[...] = array
+
+    def getNumpyWrapper(self):
+        """
+        Construct a numpy array that wraps the raw shared memory array
+        """
+        count = int(np.prod(self._shape))
+        return np.frombuffer(self._rawArray, dtype=self._dtype,
+                             count=count).reshape(self._shape)
+
+
+class SharedChunkTable:
+
+    """
+    Table of work chunk extents in shared memory.  The whole table is
+    written once by the parent; workers claim chunks by bumping a
+    shared counter, so handing out work costs one lock acquisition per
+    chunk rather than a pickle round-trip through a queue.  The chunk
+    id is its row index.  Once the table is exhausted (or markDone() is
+    called) a flag lets claims return without taking the lock.
+    """
+
+    dtype = np.dtype([('ref', '<i4'), ('start', '<i8'), ('end', '<i8')])
+
+    def __init__(self, chunks):
+        self._size = len(chunks)
+        self._shm = SharedMemory(create=True, size=max(1, chunks.nbytes))
+        self._nextChunk = multiprocessing.Value('q', 0)
+        self._done = RawValue('b', 0)
+        self._chunks = None
+        self.getNumpyWrapper()[:] = chunks
+
+    def __len__(self):
+        return self._size
+
+    def __getstate__(self):
+        # numpy views on the segment are per-process; rebuild on demand
+        state = self.__dict__.copy()
+        state['_chunks'] = None
+        return state
+
+    def getNumpyWrapper(self):
+        """
+        Construct a numpy structured array that wraps the shared table
+        """
+        if self._chunks is None:
+            self._chunks = np.ndarray(self._size, dtype=self.dtype,
+                                      buffer=self._shm.buf)
+        return self._chunks
+
+    def claimChunk(self):
+        """
+        Claim the next unprocessed chunk.  Returns a
+        (chunkId, refId, start, end) tuple, or None once every chunk has
+        been handed out.
+        """
+        if self._done.value:
+            return None
+        with self._nextChunk.get_lock():
+            chunkId = self._nextChunk.value
+            if chunkId >= self._size:
+                return None
+            self._nextChunk.value = chunkId + 1
+            if chunkId + 1 == self._size:
+                self._done.value = 1
+        (refId, start, end) = self.getNumpyWrapper()[chunkId].item()
+        return (chunkId, refId, start, end)
+
+    def markDone(self):
+        """
+        Stop handing out chunks; later claims come back empty
+        """
+        self._done.value = 1
+
+    def close(self):
+        self._chunks = None
+        self._shm.close()
+
+    def unlink(self):
+        self._shm.unlink()
+
+
+class SharedBufferPool:
+
+    """
+    Fixed set of equally sized byte buffers in shared memory, handed
+    out through a free list.  A producer rents a buffer, fills it and
+    passes only its index on; the consumer releases the index once it
+    has read the buffer.  The free list is a stack of indices kept in
+    shared memory, so renting and releasing never go through a pipe.
+    """
+
+    def __init__(self, nBuffers, bufferSize):
+        self.bufferSize = bufferSize
+        self._shm = SharedMemory(create=True, size=nBuffers * bufferSize)
+        self._freeList = RawArray('i', range(nBuffers))
+        self._nFree = RawValue('i', nBuffers)
+        self._lock = multiprocessing.Lock()
+        # Counts the free buffers; rent() blocks on it
+        self._available = multiprocessing.Semaphore(nBuffers)
+
+    def rent(self):
+        """
+        Take a free buffer index, blocking until one is available.
+        """
+        self._available.acquire()
+        with self._lock:
+            self._nFree.value -= 1
+            return self._freeList[self._nFree.value]
+
+    def release(self, index):
+        with self._lock:
+            self._freeList[self._nFree.value] = index
+            self._nFree.value += 1
+        self._available.release()
+
+    def getBuffer(self, index):
+        """
+        Return a memoryview over buffer `index`.  Release it (or use it
+        as a context manager) before the pool is closed.
+        """
+        offset = index * self.bufferSize
+        return self._shm.buf[offset:offset + self.bufferSize]
+
+    def close(self):
+        self._shm.close()
+
+    def unlink(self):
+        self._shm.unlink()
+
+
+class SharedNamespace:
+
+    """
+    Read-only copy of an argparse.Namespace, stored once in shared
+    memory as JSON.  Child processes rebuild it with load() rather than
+    each having the namespace pickled into it.
+    """
+
+    def __init__(self, namespace):
+        blob = json.dumps(vars(namespace)).encode("utf-8")
+        self._size = len(blob)
+        self._shm = SharedMemory(create=True, size=max(1, len(blob)))
+        self._shm.buf[:len(blob)] = blob
+
+    def load(self):
+        """
+        Return the namespace as a types.SimpleNamespace
+        """
+        blob = bytes(self._shm.buf[:self._size])
+        return types.SimpleNamespace(**json.loads(blob))
+
+    def close(self):
+        self._shm.close()
+
+    def unlink(self):
+        self._shm.unlink()
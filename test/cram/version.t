@@ -7,7 +7,7 @@ A simple test of the version and help options:
   usage: ipdSummary [-h] [--version] [--log-file LOG_FILE]
                     [--log-level {DEBUG,INFO,WARNING,ERROR,CRITICAL} | --debug | --quiet | -v]
                     --reference REFERENCE [--gff GFF] [--csv CSV]
-                    [--bigwig BIGWIG] [--numWorkers NUMWORKERS]
+                    [--bigwig BIGWIG] [--numWorkers NUMWORKERS] [--pinWorkers]
                     [--pvalue PVALUE] [--maxLength MAXLENGTH]
                     [--identify IDENTIFY] [--methylFraction] [--outfile OUTFILE]
                     [--m5Cgff M5CGFF] [--m5Cclassifier M5CCLASSIFIER]
@@ -55,3 +55,15 @@ class TestReferenceUtils:
 
     def test_enumerateChunks(self):
         pass  # TODO
+
+
+class TestChunkBounds:
+
+    def test_enumerateChunkBounds(self):
+        for (start, end) in [(0, 5000), (1, 5000), (999, 1001), (1500, 1700)]:
+            window = ReferenceUtils.ReferenceWindow(
+                refId=0, refName="ref", start=start, end=end)
+            expected = [(c.start, c.end)
+                        for c in ReferenceUtils.enumerateChunks(1000, window)]
+            (starts, ends) = ReferenceUtils.enumerateChunkBounds(1000, window)
+            assert list(zip(starts.tolist(), ends.tolist())) == expected
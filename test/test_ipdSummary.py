@@ -0,0 +1,80 @@
+import multiprocessing
+import os
+import sys
+import threading
+import time
+
+from kineticsTools.ipdSummary import (_parseCpuList, _slurpWindowFile,
+                                      monitorChildProcesses)
+
+
+def _sleep():
+    time.sleep(10)
+
+
+def _fail():
+    sys.exit(3)
+
+
+class TestSlurpWindowFile:
+
+    def test_file(self, tmp_path):
+        fname = tmp_path / "windows.txt"
+        fname.write_text("chr1:0-100\n\n  chr2  \r\n\n")
+        assert _slurpWindowFile(str(fname)) == "chr1:0-100,chr2"
+
+    def test_empty(self, tmp_path):
+        fname = tmp_path / "windows.txt"
+        fname.write_text("")
+        assert _slurpWindowFile(str(fname)) == ""
+
+    def test_pipe(self, tmp_path):
+        # Like -W <(...): not a regular file, and fstat reports size 0
+        fname = str(tmp_path / "windows.fifo")
+        os.mkfifo(fname)
+
+        def write():
+            with open(fname, "w") as f:
+                f.write("chr1:0-100\n\nchr2\n")
+        writer = threading.Thread(target=write)
+        writer.start()
+        try:
+            assert _slurpWindowFile(fname) == "chr1:0-100,chr2"
+        finally:
+            writer.join()
+
+
+class TestParseCpuList:
+
+    def test_ranges(self):
+        assert _parseCpuList("0-3\n") == [0, 1, 2, 3]
+
+    def test_commas(self):
+        assert _parseCpuList("0-1,4,6-7\n") == [0, 1, 4, 6, 7]
+
+    def test_empty(self):
+        # Memory-only NUMA nodes have no CPUs
+        assert _parseCpuList("\n") == []
+        assert _parseCpuList("") == []
+
+
+class TestMonitorChildProcesses:
+
+    def test_clean_exit(self):
+        children = [multiprocessing.Process(target=time.sleep, args=(0,))
+                    for i in range(2)]
+        for p in children:
+            p.start()
+        assert monitorChildProcesses(children) == 0
+
+    def test_failure(self):
+        children = [multiprocessing.Process(target=_sleep),
+                    multiprocessing.Process(target=_fail)]
+        for p in children:
+            p.start()
+        try:
+            assert monitorChildProcesses(children) == 3
+            assert children[0].is_alive()
+        finally:
+            children[0].terminate()
+            children[0].join()
@@ -0,0 +1,171 @@
+import argparse
+import multiprocessing
+
+import numpy as np
+
+from kineticsTools.sharedArray import (SharedBufferPool, SharedChunkTable,
+                                       SharedNamespace, SharedNumpyArray)
+
+
+def _drain(table, out):
+    while True:
+        chunk = table.claimChunk()
+        if chunk is None:
+            break
+        out.put(chunk)
+
+
+def _sum(shared, out):
+    out.put(shared.getNumpyWrapper().sum())
+
+
+def _rentRelease(pool, out, nRents):
+    ok = True
+    for i in range(nRents):
+        index = pool.rent()
+        ok = ok and 0 <= index < 4
+        pool.release(index)
+    out.put(ok)
+
+
+def _makeTable(nChunks):
+    chunks = np.fromiter(((0, i * 10, (i + 1) * 10) for i in range(nChunks)),
+                         dtype=SharedChunkTable.dtype)
+    return SharedChunkTable(chunks)
+
+
+class TestSharedNumpyArray:
+
+    def test_wrapper(self):
+        array = np.arange(12, dtype=np.int32).reshape(3, 4)
+        wrapper = SharedNumpyArray(array).getNumpyWrapper()
+        assert wrapper.dtype == array.dtype
+        assert wrapper.shape == array.shape
+        assert (wrapper == array).all()
+
+    def test_empty(self):
+        array = np.empty((0, 3), dtype=np.float32)
+        assert SharedNumpyArray(array).getNumpyWrapper().shape == (0, 3)
+
+    def test_child(self):
+        shared = SharedNumpyArray(np.arange(10, dtype=np.float32))
+        out = multiprocessing.Queue()
+        p = multiprocessing.Process(target=_sum, args=(shared, out))
+        p.start()
+        assert out.get() == 45
+        p.join()
+
+
+class TestSharedChunkTable:
+
+    def test_claim(self):
+        table = _makeTable(2)
+        try:
+            assert len(table) == 2
+            assert table.claimChunk() == (0, 0, 0, 10)
+            assert table.claimChunk() == (1, 0, 10, 20)
+            assert table.claimChunk() is None
+        finally:
+            table.close()
+            table.unlink()
+
+    def test_mark_done(self):
+        table = _makeTable(5)
+        try:
+            assert table.claimChunk() == (0, 0, 0, 10)
+            table.markDone()
+            assert table.claimChunk() is None
+        finally:
+            table.close()
+            table.unlink()
+
+    def test_empty(self):
+        table = SharedChunkTable(np.empty(0, dtype=SharedChunkTable.dtype))
+        try:
+            assert table.claimChunk() is None
+        finally:
+            table.close()
+            table.unlink()
+
+    def test_workers(self):
+        nChunks, nWorkers = 100, 3
+        table = _makeTable(nChunks)
+        out = multiprocessing.Queue()
+        workers = [multiprocessing.Process(target=_drain, args=(table, out))
+                   for i in range(nWorkers)]
+        try:
+            for p in workers:
+                p.start()
+            chunks = sorted(out.get() for i in range(nChunks))
+            for p in workers:
+                p.join()
+        finally:
+            table.close()
+            table.unlink()
+        assert chunks == [(i, 0, i * 10, (i + 1) * 10) for i in range(nChunks)]
+
+
+class TestSharedBufferPool:
+
+    def test_rent_release(self):
+        pool = SharedBufferPool(2, 16)
+        try:
+            indices = sorted([pool.rent(), pool.rent()])
+            assert indices == [0, 1]
+            with pool.getBuffer(1) as buf:
+                buf[:5] = b"hello"
+            with pool.getBuffer(1) as buf:
+                assert bytes(buf[:5]) == b"hello"
+            pool.release(1)
+            assert pool.rent() == 1
+        finally:
+            pool.close()
+            pool.unlink()
+
+    def test_many_buffers(self):
+        # More free indices than a pipe buffer could hold
+        nBuffers = 20000
+        pool = SharedBufferPool(nBuffers, 16)
+        try:
+            indices = [pool.rent() for i in range(nBuffers)]
+            assert sorted(indices) == list(range(nBuffers))
+            for index in indices:
+                pool.release(index)
+            assert pool.rent() == indices[-1]
+        finally:
+            pool.close()
+            pool.unlink()
+
+    def test_workers(self):
+        pool = SharedBufferPool(4, 16)
+        out = multiprocessing.Queue()
+        workers = [multiprocessing.Process(target=_rentRelease,
+                                           args=(pool, out, 100))
+                   for i in range(3)]
+        try:
+            for p in workers:
+                p.start()
+            assert all(out.get() for p in workers)
+            for p in workers:
+                p.join()
+            assert sorted(pool.rent() for i in range(4)) == [0, 1, 2, 3]
+        finally:
+            pool.close()
+            pool.unlink()
+
+
+class TestSharedNamespace:
+
+    def test_load(self):
+        args = argparse.Namespace(numWorkers=4, identify=True,
+                                  modsToCall=['H', 'J'], control=None)
+        shared = SharedNamespace(args)
+        try:
+            options = shared.load()
+            assert options.numWorkers == 4
+            assert options.identify is True
+            assert options.modsToCall == ['H', 'J']
+            assert options.control is None
+        finally:
+            shared.close()
+            shared.unlink()